@@ -0,0 +1,390 @@
+"""销售回款统计脚本的测试数据生成和规模基准测试
+
+生成一组测试数据（每日销售回款额.xlsx、上月销售回款额.xlsx、员工花名册.xlsx）：
+    python benchmark.py generate --employees 1000 --output 测试数据
+按不同员工规模运行基准测试，记录各阶段耗时并与基线比对结果，同时检查各类积分规则参数的假设分析、
+含布尔值等特殊单元格的金额解析，以及数据范围记录过期的每日数据的读取：
+    python benchmark.py run                       # 默认 10、1000、10000、50000 名员工
+    python benchmark.py run --sizes 10 1000       # 只测部分规模
+    python benchmark.py run --update-baseline     # 以本次结果更新基线
+"""
+import argparse
+import copy
+import importlib.util
+import json
+import math
+import os
+import re
+import shutil
+import tempfile
+import time
+import zipfile
+from datetime import datetime
+from importlib.machinery import SourceFileLoader
+
+import numpy as np
+import openpyxl
+import pandas as pd
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+ETL_SCRIPT = os.path.join(SCRIPT_DIR, 'creat_sale_and_collect_excel')
+BASELINE_FILE = os.path.join(SCRIPT_DIR, 'benchmark_baselines.json')
+
+DEFAULT_SIZES = [10, 1000, 10000, 50000]
+# 假设分析检查：每类积分规则各取一个参数路径，每个方案的结果须与按该取值单独计算的积分一致
+WHAT_IF_CHECK_GRID = {
+    'target_scores.0.target': [400000, 500000],
+    'overdue_score.penalty': [10, 30],
+    'rank_scores.1.step': [0.25, 1],
+    'progress_scores.0.intervals.0.min_rate': [0.05, 0.2],
+    'progress_scores.1.intervals.2.from': [250000, 350000],
+    'progress_scores.0.intervals.1.points.0': [4.5, 6],
+    'team_bonus.rules.0.threshold': [300000, 400000],
+    'team_bonus.rules.1.points': [3, 8],
+    'base_score.points': [5, 12],
+}
+# 总耗时超过基线的该倍数时提示性能回退（不同机器耗时差异较大，只提示不判定失败）
+# 金额解析检查：(单元格取值, 无法解析的单元格数)，结果须与逐个调用convert_amount一致（文本'nan'按0处理）
+AMOUNT_PARSING_CASES = [
+    (['1,000', True], 0),
+    ([5, True], 0),
+    (['1.5万', '', None, '１２３', 3.5, False], 0),
+    (['nan', 'abc', '万'], 3),
+]
+SLOWDOWN_WARNING_RATIO = 1.5
+
+SURNAMES = list('王李张刘陈杨黄赵吴周徐孙马朱胡郭何高林罗郑梁谢宋唐许韩冯邓曹彭曾肖田董袁潘于蒋蔡余杜叶程苏魏吕丁任沈姚卢姜崔钟谭陆汪范金石廖贾夏韦付方白邹孟熊秦邱江尹薛闫段雷侯龙史陶黎贺顾毛郝龚邵万钱严覃武戴莫孔向汤')
+GIVEN_NAME_CHARS = list('伟芳娜敏静丽强磊军洋勇艳杰娟涛明超秀霞平刚桂英华玉兰萍鹏建文辉力斌宇浩凯晨欣雪婷俊峰鑫庚淇彤格雨梅伴')
+# 企业微信导出中出现过的部门写法，含需要标准化的别名和不参与部门统计的部门
+DEPARTMENTS = ['大客户', '大客户组', '经理室', '经理室组', '801', '801组', '901', '901组', '行政部']
+
+
+def make_employee_names(count, rng):
+    """生成count个不重复的中文姓名（单姓 + 一到两个字），不够时加数字后缀"""
+    names = []
+    seen = set()
+    while len(names) < count:
+        name = rng.choice(SURNAMES) + ''.join(rng.choice(GIVEN_NAME_CHARS, size=rng.integers(1, 3)))
+        if name in seen:
+            name = f"{name}{len(names)}"
+        seen.add(name)
+        names.append(name)
+    return names
+
+
+def format_amounts(values, rng, wan_ratio, comma_ratio, missing_ratio, invalid_ratio):
+    """将整数金额按比例转换为导出文件中的各种写法：数值、'万'单位、千分位字符串、空值和无法识别的内容"""
+    cells = values.astype(object)
+    kinds = rng.random(len(values))
+    for position in np.flatnonzero(kinds < wan_ratio):
+        cells[position] = f"{values[position] / 10000:g}万"
+    threshold = wan_ratio
+    for position in np.flatnonzero((kinds >= threshold) & (kinds < threshold + comma_ratio)):
+        cells[position] = f"{values[position]:,}"
+    threshold += comma_ratio
+    cells[(kinds >= threshold) & (kinds < threshold + missing_ratio)] = None
+    threshold += missing_ratio
+    cells[(kinds >= threshold) & (kinds < threshold + invalid_ratio)] = '待确认'
+    return cells
+
+
+def generate_test_data(output_dir, employees=100, year=2025, month=7, days=None, departments=None,
+                       history_months=1, absent_ratio=0.2, wan_ratio=0.1, comma_ratio=0.1,
+                       missing_ratio=0.05, invalid_ratio=0.01, seed=0, with_roster=True):
+    """生成一组与企业微信导出格式一致的测试数据，写入output_dir
+
+    employees 为员工数，days 为目标月份的天数（默认整月），history_months 为目标月份之前额外包含的月份数。
+    每位员工每天以 1 - absent_ratio 的概率有记录；金额按比例混入'万'单位、千分位、空值和无法识别的内容，
+    部分姓名带有导出时残留的<br>。with_roster=True 时同时生成员工花名册.xlsx，员工均匀分到6个小组。
+    返回各文件的行数
+    """
+    rng = np.random.default_rng(seed)
+    departments = departments or DEPARTMENTS
+    os.makedirs(output_dir, exist_ok=True)
+
+    names = make_employee_names(employees, rng)
+    employee_departments = rng.choice(departments, size=employees)
+
+    # 目标月份及之前的历史月份，按时间顺序
+    months = []
+    for offset in range(history_months, -1, -1):
+        key = year * 12 + month - 1 - offset
+        months.append((key // 12, key % 12 + 1))
+
+    workbook = openpyxl.Workbook(write_only=True)
+    worksheet = workbook.create_sheet()
+    worksheet.append(['姓名', '日期', '所在部门', '今日销售额', '今日回款额（不包含超期账款）',
+                      '超期账款回款额', '超期账款（未追回）'])
+    daily_rows = 0
+    for row_year, row_month in months:
+        month_days = (datetime(row_year + row_month // 12, row_month % 12 + 1, 1) - datetime(row_year, row_month, 1)).days
+        if days is not None and (row_year, row_month) == (year, month):
+            month_days = min(days, month_days)
+
+        # 员工 × 日 的网格，超期欠款从月初余额逐日递减
+        present = rng.random((employees, month_days)) >= absent_ratio
+        opening_overdue = rng.integers(0, 200000, size=employees)
+        overdue = np.maximum(opening_overdue[:, None] - np.cumsum(rng.integers(0, 5000, size=(employees, month_days)), axis=1), 0)
+        employee_idx, day_idx = np.nonzero(present)
+        row_count = len(employee_idx)
+
+        amounts = {
+            col: format_amounts(rng.integers(0, 80000, size=row_count), rng,
+                                wan_ratio, comma_ratio, missing_ratio, invalid_ratio)
+            for col in ['今日销售额', '今日回款额（不包含超期账款）', '超期账款回款额']
+        }
+        name_suffix = np.where(rng.random(row_count) < 0.05, '<br>', '')
+        dates = [datetime(row_year, row_month, day + 1) for day in range(month_days)]
+        overdue_values = overdue[employee_idx, day_idx]
+
+        for position in range(row_count):
+            employee = employee_idx[position]
+            worksheet.append([names[employee] + name_suffix[position], dates[day_idx[position]],
+                              employee_departments[employee],
+                              amounts['今日销售额'][position], amounts['今日回款额（不包含超期账款）'][position],
+                              amounts['超期账款回款额'][position], int(overdue_values[position])])
+        daily_rows += row_count
+    workbook.save(os.path.join(output_dir, '每日销售回款额.xlsx'))
+
+    # 上月数据：部分员工没有上月记录
+    workbook = openpyxl.Workbook(write_only=True)
+    worksheet = workbook.create_sheet()
+    worksheet.append(['姓名', '上月销售额', '上月回款额'])
+    last_month_present = np.flatnonzero(rng.random(employees) >= 0.05)
+    last_month_sales = format_amounts(rng.integers(100000, 600000, size=employees), rng, wan_ratio, comma_ratio, 0, 0)
+    last_month_payment = format_amounts(rng.integers(100000, 600000, size=employees), rng, wan_ratio, comma_ratio, 0, 0)
+    for employee in last_month_present:
+        worksheet.append([names[employee], last_month_sales[employee], last_month_payment[employee]])
+    workbook.save(os.path.join(output_dir, '上月销售回款额.xlsx'))
+
+    counts = {'每日销售回款额.xlsx': daily_rows, '上月销售回款额.xlsx': len(last_month_present)}
+
+    if with_roster:
+        workbook = openpyxl.Workbook(write_only=True)
+        worksheet = workbook.create_sheet()
+        worksheet.append(['员工姓名', '组别', '组内顺序', '本月销售任务', '本月回款任务', '所在部门'])
+        sales_targets = rng.integers(20, 80, size=employees) * 10000
+        payment_targets = rng.integers(10, 80, size=employees) * 10000
+        for employee, name in enumerate(names):
+            worksheet.append([name, employee % 6 + 1, employee // 6, int(sales_targets[employee]),
+                              int(payment_targets[employee]), str(employee_departments[employee])])
+        workbook.save(os.path.join(output_dir, '员工花名册.xlsx'))
+        counts['员工花名册.xlsx'] = employees
+
+    return counts
+
+
+def load_etl_module(script_path, module_name):
+    """从没有.py扩展名的脚本文件加载模块"""
+    loader = SourceFileLoader(module_name, script_path)
+    spec = importlib.util.spec_from_loader(module_name, loader)
+    module = importlib.util.module_from_spec(spec)
+    loader.exec_module(module)
+    return module
+
+
+def summarize_results(sales_data, score_data):
+    """提取用于和基线比对的结果摘要：员工数和关键列的合计（不含合计行）"""
+    employees = sales_data[sales_data['员工姓名'] != '']
+    scores = score_data[score_data['员工姓名'] != '']
+    summary = {'员工数': int(len(employees))}
+    for col in ['本月销售额', '本月回款合计', '上月销售额', '月末逾期未收回额']:
+        summary[col] = round(float(employees[col].sum()), 2)
+    for col in ['个人总积分', '加权小组总分']:
+        summary[col] = round(float(scores[col].sum()), 2)
+    return summary
+
+
+def check_what_if(etl, sales_data, grid=None):
+    """逐个参数路径运行假设分析，与按该取值单独计算的个人总积分、加权小组总分比对，返回不一致的参数路径"""
+    grid = grid or WHAT_IF_CHECK_GRID
+    base_rules = etl.load_scoring_rules()
+    scored = etl.attach_roster(sales_data, ['组别'], warn=False)
+    employee_mask = (scored['员工姓名'] != '').to_numpy()
+    mismatched = []
+    for path, values in grid.items():
+        _, individual, team = etl.what_if_scores(sales_data, {path: values}, base_rules)
+        for variant_no, value in enumerate(values):
+            rules = copy.deepcopy(base_rules)
+            etl.set_rule_parameter(rules, path, value)
+            expected = etl.calculate_group_scores(etl.calculate_scores(scored.copy(), etl.compile_scoring_rules(rules)))
+            expected = expected[employee_mask]
+            expected_teams = expected.groupby('队名')['加权小组总分'].first()
+            variant_individual = individual[individual['方案编号'] == variant_no]
+            variant_team = team[team['方案编号'] == variant_no].set_index('队名')['加权小组总分']
+            if not (np.allclose(variant_individual['个人总积分'], expected['个人总积分'], atol=0.005) and
+                    np.allclose(variant_team.reindex(expected_teams.index), expected_teams, atol=0.005)):
+                mismatched.append(f"{path}={value}")
+    return mismatched
+
+
+def check_amount_parsing(etl):
+    """按整列转换 AMOUNT_PARSING_CASES 中的金额，与逐个调用convert_amount的结果和无法解析的单元格数比对，返回不一致的用例"""
+    mismatched = []
+    for values, expected_invalid in AMOUNT_PARSING_CASES:
+        amounts, invalid_count = etl.convert_amount_column(pd.Series(values, dtype=object))
+        expected = np.nan_to_num([etl.convert_amount(value) for value in values], nan=0.0)
+        if invalid_count != expected_invalid or not np.array_equal(amounts.to_numpy(), expected):
+            mismatched.append(f"金额解析 {values}")
+    return mismatched
+
+
+def write_stale_dimension_copy(xlsx_file, output_file, dimension='A1:G2'):
+    """复制工作簿，并把第一个工作表记录的数据范围（<dimension>）改为过期的小范围
+
+    许多导出工具写入的数据范围与实际行数不符，只读模式按记录的范围读取会丢失后面的行
+    """
+    with zipfile.ZipFile(xlsx_file) as source, zipfile.ZipFile(output_file, 'w', zipfile.ZIP_DEFLATED) as target:
+        for item in source.infolist():
+            data = source.read(item.filename)
+            if item.filename == 'xl/worksheets/sheet1.xml':
+                stale = f'<dimension ref="{dimension}"/>'.encode()
+                if b'<dimension ' in data:
+                    data = re.sub(rb'<dimension [^>]*/>', stale, data, count=1)
+                else:
+                    # 按工作表XML的元素顺序插在sheetViews之前
+                    anchor = b'<sheetViews' if b'<sheetViews' in data else b'<sheetData'
+                    data = data.replace(anchor, stale + anchor, 1)
+            target.writestr(item, data)
+
+
+def check_stale_dimension(etl, daily_file, year, month):
+    """每日数据的数据范围记录过期时，读取结果须与正常文件一致，返回不一致的检查项"""
+    stale_file = os.path.join(os.path.dirname(daily_file), '数据范围过期_每日销售回款额.xlsx')
+    write_stale_dimension_copy(daily_file, stale_file)
+    try:
+        expected = etl.read_daily_excel(daily_file, [(year, month)])
+        actual = etl.read_daily_excel(stale_file, [(year, month)])
+    finally:
+        os.remove(stale_file)
+    return [] if actual.equals(expected) else [f"数据范围过期时读取 {len(actual)} 行，应为 {len(expected)} 行"]
+
+
+def run_size(employees, year=2025, month=7, keep_dir=None):
+    """生成指定员工数的测试数据并运行一次完整的统计流程，返回耗时、各阶段记录和结果摘要"""
+    work_dir = keep_dir or tempfile.mkdtemp(prefix=f'sales_benchmark_{employees}_')
+    try:
+        start = time.perf_counter()
+        rows = generate_test_data(work_dir, employees=employees, year=year, month=month)
+        generate_seconds = time.perf_counter() - start
+
+        script_path = os.path.join(work_dir, os.path.basename(ETL_SCRIPT))
+        shutil.copy(ETL_SCRIPT, script_path)
+        etl = load_etl_module(script_path, f'sales_etl_benchmark_{employees}')
+
+        start = time.perf_counter()
+        # 不启用tracemalloc，避免逐行解析等阶段的耗时被放大
+        sales_data, score_data = etl.process_sales_data(target_month=month, target_year=year, profile=True,
+                                                        trace_memory=False)
+        total_seconds = time.perf_counter() - start
+        if sales_data is None:
+            raise RuntimeError(f"{employees} 名员工的统计流程没有生成结果")
+
+        failed_checks = [f"假设分析 {item}" for item in check_what_if(etl, sales_data)]
+        failed_checks += check_amount_parsing(etl)
+        failed_checks += check_stale_dimension(etl, os.path.join(work_dir, '每日销售回款额.xlsx'), year, month)
+
+        report_file = os.path.join(work_dir, f"员工销售回款统计_{year}年{month}月_性能报告.json")
+        with open(report_file, encoding='utf-8') as f:
+            report = json.load(f)
+
+        return {
+            '每日数据行数': rows['每日销售回款额.xlsx'],
+            '生成数据秒': round(generate_seconds, 3),
+            '总耗时秒': round(total_seconds, 3),
+            '阶段耗时秒': {stage['阶段']: stage['耗时秒'] for stage in report['阶段']},
+            '进程峰值内存MB': max((stage.get('进程峰值内存MB', 0) for stage in report['阶段']), default=0),
+            '结果': summarize_results(sales_data, score_data),
+            '检查不一致': failed_checks
+        }
+    finally:
+        if keep_dir is None:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def compare_with_baseline(employees, result, baseline):
+    """与基线比对：结果摘要必须一致，耗时明显变慢时提示。返回是否一致"""
+    mismatched = [key for key, value in baseline['结果'].items()
+                  if key not in result['结果'] or not math.isclose(result['结果'][key], value, abs_tol=0.005)]
+    if mismatched:
+        print(f"错误：{employees} 名员工的结果与基线不一致:")
+        for key in mismatched:
+            print(f"  {key}: 基线 {baseline['结果'][key]}，本次 {result['结果'].get(key)}")
+
+    if result['总耗时秒'] > baseline['总耗时秒'] * SLOWDOWN_WARNING_RATIO:
+        print(f"警告：{employees} 名员工总耗时 {result['总耗时秒']:.2f} 秒，基线 {baseline['总耗时秒']:.2f} 秒")
+        for stage, seconds in result['阶段耗时秒'].items():
+            baseline_seconds = baseline['阶段耗时秒'].get(stage)
+            if baseline_seconds and seconds > baseline_seconds * SLOWDOWN_WARNING_RATIO:
+                print(f"  {stage}: {seconds:.2f} 秒（基线 {baseline_seconds:.2f} 秒）")
+    return not mismatched
+
+
+def run_benchmark(sizes=None, baseline_file=BASELINE_FILE, update_baseline=False):
+    """按各员工规模依次运行统计流程，输出耗时对比表并与基线比对
+
+    基线中没有的规模或 update_baseline=True 时，以本次结果写入基线。返回所有规模的结果是否与基线一致
+    """
+    sizes = sizes or DEFAULT_SIZES
+    baselines = {}
+    if os.path.exists(baseline_file):
+        with open(baseline_file, encoding='utf-8') as f:
+            baselines = json.load(f)
+
+    results = {}
+    all_matched = True
+    for employees in sizes:
+        print(f"\n========== {employees} 名员工 ==========")
+        result = run_size(employees)
+        failed_checks = result.pop('检查不一致')
+        if failed_checks:
+            print(f"错误：{employees} 名员工的检查未通过: {'、'.join(failed_checks)}")
+            all_matched = False
+        results[employees] = result
+        key = str(employees)
+        if key in baselines and not update_baseline:
+            all_matched &= compare_with_baseline(employees, result, baselines[key])
+        else:
+            baselines[key] = result
+            print(f"已记录 {employees} 名员工的基线")
+
+    stages = list(dict.fromkeys(stage for result in results.values() for stage in result['阶段耗时秒']))
+    print("\n规模基准测试结果（秒）：")
+    print('员工数\t每日行数\t总耗时\t' + '\t'.join(stages) + '\t峰值内存MB')
+    for employees, result in results.items():
+        stage_seconds = '\t'.join(f"{result['阶段耗时秒'].get(stage, 0):.2f}" for stage in stages)
+        print(f"{employees}\t{result['每日数据行数']}\t{result['总耗时秒']:.2f}\t{stage_seconds}\t"
+              f"{result['进程峰值内存MB']:.0f}")
+
+    with open(baseline_file, 'w', encoding='utf-8') as f:
+        json.dump(dict(sorted(baselines.items(), key=lambda item: int(item[0]))), f, ensure_ascii=False, indent=2)
+    print(f"\n基线文件: {baseline_file}")
+    return all_matched
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="销售回款统计的测试数据生成和规模基准测试")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    generate_parser = subparsers.add_parser('generate', help="生成测试数据")
+    generate_parser.add_argument('--employees', type=int, default=100, help="员工数")
+    generate_parser.add_argument('--days', type=int, default=None, help="目标月份的天数，默认整月")
+    generate_parser.add_argument('--year', type=int, default=2025)
+    generate_parser.add_argument('--month', type=int, default=7)
+    generate_parser.add_argument('--seed', type=int, default=0)
+    generate_parser.add_argument('--no-roster', action='store_true', help="不生成员工花名册.xlsx")
+    generate_parser.add_argument('--output', default='测试数据', help="输出目录")
+
+    run_parser = subparsers.add_parser('run', help="运行规模基准测试")
+    run_parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES, help="员工规模列表")
+    run_parser.add_argument('--update-baseline', action='store_true', help="以本次结果更新基线")
+    args = parser.parse_args()
+
+    if args.command == 'generate':
+        counts = generate_test_data(args.output, employees=args.employees, year=args.year, month=args.month,
+                                    days=args.days, seed=args.seed, with_roster=not args.no_roster)
+        for file_name, rows in counts.items():
+            print(f"{os.path.join(args.output, file_name)}: {rows} 行")
+    else:
+        if not run_benchmark(args.sizes, update_baseline=args.update_baseline):
+            raise SystemExit(1)
@@ -4,8 +4,8 @@ import numpy as np
 import plotly.express as px
 import plotly.graph_objects as go
 import base64
+import hashlib
 import os
-import glob
 import warnings
 from html import escape
 import time
@@ -16,6 +16,17 @@ import re
 # 忽略警告
 warnings.filterwarnings('ignore')
 
+# 解析结果缓存最多保留的文件数，所有会话共享，超出时淘汰最久未使用的
+EXCEL_CACHE_MAX_ENTRIES = 16
+
+# 统计结果文件中的工作表：积分表必需，其余可选（按顺序查找，兼容旧版本的工作表名）
+SCORE_SHEET = '员工积分数据'
+OPTIONAL_SHEETS = {
+    'sales': ['销售回款数据统计', '销售回款数据'],
+    'department': ['部门销售回款统计'],
+    'ranking': ['销售回款超期账款排名'],
+}
+
 # 列名常量定义
 LAST_MONTH_SALES_COL = "上月销售额"  # 原来是"上月销售额(参考)"
 LAST_MONTH_PAYMENT_COL = "上月回款额"  # 原来是"上月回款额(参考)"
@@ -48,6 +59,8 @@ if 'ranking_df' not in st.session_state:
     st.session_state.ranking_df = None
 if 'file_name' not in st.session_state:
     st.session_state.file_name = None
+if 'view_model' not in st.session_state:
+    st.session_state.view_model = None  # 当前数据集的视图数据，加载新数据时清空
 # 添加历史数据相关的状态变量
 if 'historical_data' not in st.session_state:
     st.session_state.historical_data = []  # 存储多个月份的数据
@@ -613,55 +626,136 @@ def load_css():
     """, unsafe_allow_html=True)
 
 
-# 自动检测Excel文件
+# 统计结果文件名：员工销售回款统计_<年>年<月>月*.xlsx，年月取自文件名
+REPORT_FILE_PATTERN = re.compile(r'^员工销售回款统计_(\d{4})年(\d{1,2})月.*\.xlsx$')
+
+
+# 目录中的统计结果索引 {(年, 月): 文件名}，同一月份有多个文件时取修改时间最新的
+# directory_mtime 只作为缓存键：目录中增删、重命名文件时目录修改时间变化，才重新扫描
+@st.cache_data(max_entries=EXCEL_CACHE_MAX_ENTRIES, show_spinner=False)
+def index_report_files(directory, directory_mtime):
+    candidates = {}
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            match = REPORT_FILE_PATTERN.match(entry.name)
+            if match and entry.is_file():
+                month = (int(match.group(1)), int(match.group(2)))
+                candidates.setdefault(month, []).append((entry.stat().st_mtime_ns, entry.name))
+    return {month: max(files)[1] for month, files in candidates.items()}
+
+
+# 自动检测Excel文件：当前目录中月份最新的统计结果
 def auto_detect_excel_file():
     try:
-        pattern = "员工销售回款统计_*.xlsx"
-        files = glob.glob(pattern)
-        if files:
-            latest_file = max(files, key=os.path.getctime)
-            return latest_file
+        directory = os.getcwd()
+        index = index_report_files(directory, os.stat(directory).st_mtime_ns)
+        if index:
+            return index[max(index)]
         return None
-    except Exception as e:
+    except OSError as e:
         st.error(f"文件检测出错: {e}")
         return None
 
 
-# 加载Excel数据
+# 加载Excel数据：只打开一次工作簿（只读模式），只解析存在的工作表
+# 返回 (积分, 销售回款, 部门, 排名, 缺失的可选工作表列表, 错误信息)
 def load_excel_data(file_path):
     try:
-        # Load score_df (required)
-        score_df = pd.read_excel(file_path, sheet_name='员工积分数据', engine='openpyxl')
-        if '队名' not in score_df.columns:
-            return None, None, None, None, "数据文件中缺少'队名'列"
-
-        # Load sales_df (optional)
-        sales_df = None
-        try:
-            sales_df = pd.read_excel(file_path, sheet_name='销售回款数据统计', engine='openpyxl')
-        except:
-            try:
-                sales_df = pd.read_excel(file_path, sheet_name='销售回款数据', engine='openpyxl')
-            except:
-                pass
-
-        # Load department_sales_df (optional)
-        department_sales_df = None
-        try:
-            department_sales_df = pd.read_excel(file_path, sheet_name='部门销售回款统计', engine='openpyxl')
-        except:
-            pass
-
-        # Load ranking_df (optional) - 员工排名数据
-        ranking_df = None
-        try:
-            ranking_df = pd.read_excel(file_path, sheet_name='销售回款超期账款排名', engine='openpyxl')
-        except:
-            pass
-
-        return score_df, sales_df, department_sales_df, ranking_df, None
+        with pd.ExcelFile(file_path, engine='openpyxl') as excel:
+            sheet_names = set(excel.sheet_names)
+
+            # Load score_df (required)
+            if SCORE_SHEET not in sheet_names:
+                return None, None, None, None, [], f"数据文件中缺少'{SCORE_SHEET}'工作表"
+            score_df = excel.parse(SCORE_SHEET)
+            if '队名' not in score_df.columns:
+                return None, None, None, None, [], "数据文件中缺少'队名'列"
+
+            # Load optional sheets - 销售回款统计兼容旧版本的工作表名
+            optional_dfs = {}
+            missing_sheets = []
+            for label, candidates in OPTIONAL_SHEETS.items():
+                sheet_name = next((name for name in candidates if name in sheet_names), None)
+                if sheet_name is None:
+                    missing_sheets.append(candidates[0])
+                    optional_dfs[label] = None
+                else:
+                    optional_dfs[label] = excel.parse(sheet_name)
+
+        return (score_df, optional_dfs['sales'], optional_dfs['department'], optional_dfs['ranking'],
+                missing_sheets, None)
     except Exception as e:
-        return None, None, None, None, f"读取文件时出错: {str(e)}"
+        return None, None, None, None, [], f"读取文件时出错: {str(e)}"
+
+
+# 按文件内容缓存解析结果：同一文件在任何会话、任何一次重新运行中都只解析一次
+@st.cache_data(max_entries=EXCEL_CACHE_MAX_ENTRIES, show_spinner=False)
+def load_excel_data_by_hash(content_hash, _content):
+    # content_hash 作为缓存键，文件内容本身不参与Streamlit的参数哈希
+    return load_excel_data(BytesIO(_content))
+
+
+# 统计脚本在Excel旁保存的parquet数据文件路径：员工销售回款统计_<年>年<月>月_<工作表>.parquet
+def sidecar_file_paths(excel_path):
+    stem = os.path.splitext(excel_path)[0]
+    sheet_names = [SCORE_SHEET] + [candidates[0] for candidates in OPTIONAL_SHEETS.values()]
+    return {sheet_name: f"{stem}_{sheet_name}.parquet" for sheet_name in sheet_names}
+
+
+# 可用的parquet数据文件 {工作表: 路径}：积分数据文件必须存在，且数据文件都不早于Excel文件，否则返回None
+def find_sidecar_files(excel_path):
+    existing = {sheet_name: path for sheet_name, path in sidecar_file_paths(excel_path).items()
+                if os.path.exists(path)}
+    if SCORE_SHEET not in existing:
+        return None
+    if os.path.exists(excel_path):
+        excel_mtime = os.path.getmtime(excel_path)
+        if any(os.path.getmtime(path) < excel_mtime for path in existing.values()):
+            return None
+    return existing
+
+
+# 转换为与从Excel读取一致的取值和类型：空字符串读回为空值，整数值的数值列为int64，含空值的为float64
+def as_sheet_values(df):
+    for col in df.columns:
+        values = df[col]
+        if pd.api.types.is_string_dtype(values):
+            df[col] = values.mask(values == '')
+        elif pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values):
+            values = values.astype('float64')
+            is_integral = np.isfinite(values).all() and (values == np.trunc(values)).all()
+            df[col] = values.astype('int64') if is_integral else values
+    return df
+
+
+# 读取parquet数据文件，返回值与load_excel_data相同；modified_times 只作为缓存键，数据文件更新后重新读取
+@st.cache_data(max_entries=EXCEL_CACHE_MAX_ENTRIES, show_spinner=False)
+def load_sidecar_data(sidecar_files, modified_times):
+    frames = {sheet_name: as_sheet_values(pd.read_parquet(path)) for sheet_name, path in sidecar_files}
+    score_df = frames[SCORE_SHEET]
+    if '队名' not in score_df.columns:
+        return None, None, None, None, [], "数据文件中缺少'队名'列"
+    optional_dfs = {label: frames.get(candidates[0]) for label, candidates in OPTIONAL_SHEETS.items()}
+    missing_sheets = [candidates[0] for candidates in OPTIONAL_SHEETS.values() if candidates[0] not in frames]
+    return (score_df, optional_dfs['sales'], optional_dfs['department'], optional_dfs['ranking'],
+            missing_sheets, None)
+
+
+# 加载上传的文件或本地路径的Excel数据（带缓存），本地路径优先读取统计脚本生成的parquet数据文件
+def load_excel_data_cached(file):
+    if isinstance(file, (str, os.PathLike)):
+        sidecar_files = find_sidecar_files(file)
+        if sidecar_files:
+            try:
+                return load_sidecar_data(tuple(sidecar_files.items()),
+                                         tuple(os.path.getmtime(path) for path in sidecar_files.values()))
+            except (OSError, ValueError, ImportError):
+                pass  # 数据文件损坏或缺少pyarrow时读取Excel
+        with open(file, 'rb') as f:
+            content = f.read()
+    else:
+        content = file.getvalue()
+    return load_excel_data_by_hash(hashlib.sha256(content).hexdigest(), content)
 
 
 # 导航栏
@@ -753,14 +847,18 @@ def show_home_page():
         )
 
         if uploaded_file is not None:
-            score_df, sales_df, department_sales_df, ranking_df, error = load_excel_data(uploaded_file)
+            score_df, sales_df, department_sales_df, ranking_df, missing_sheets, error = \
+                load_excel_data_cached(uploaded_file)
             if error:
                 st.error(f"文件加载失败: {error}")
             else:
+                if missing_sheets:
+                    st.info(f"文件中没有以下工作表，相关页面不可用: {'、'.join(missing_sheets)}")
                 st.session_state.score_df = score_df
                 st.session_state.sales_df = sales_df
                 st.session_state.department_sales_df = department_sales_df
                 st.session_state.ranking_df = ranking_df
+                st.session_state.view_model = None
                 st.session_state.data_loaded = True
                 st.session_state.file_name = uploaded_file.name
                 st.success(f"文件加载成功: {uploaded_file.name}")
@@ -846,7 +944,8 @@ def show_scores_page():
 
     red_df, black_df, group_data = get_leaderboard_data(st.session_state.score_df)
     display_group_ranking(group_data, st.session_state.score_df)
-    display_employee_details(st.session_state.score_df, None)
+    view = get_view_model()
+    display_employee_details(view['scores'], view['score_rows'])
 
 
 # 销售明细页面
@@ -855,12 +954,13 @@ def show_sales_page():
         st.error("请先上传数据文件")
         return
 
-    if st.session_state.sales_df is not None:
-        display_sales_overview(st.session_state.sales_df)
-        display_weekly_analysis(st.session_state.sales_df)
+    view = get_view_model()
+    if view['sales'] is not None:
+        display_sales_overview(view)
+        display_weekly_analysis(view)
 
-    display_achievement_badges(st.session_state.score_df, st.session_state.sales_df)
-    display_sales_employee_details(st.session_state.score_df, st.session_state.sales_df)
+    display_achievement_badges(st.session_state.score_df, view['sales'])
+    display_sales_employee_details(view['employees'], view['employee_rows'])
 
 
 # 部门销售回款明细页面
@@ -874,10 +974,8 @@ def show_department_sales_page():
                 unsafe_allow_html=True)
 
     # --- Data Preparation ---
-    df = st.session_state.department_sales_df.copy()
-
-    # Remove the '合计' (Total) row for rankings and charts
-    df = df[df['部门'] != '合计'].copy()
+    # The '合计' (Total) row is removed and total payments are calculated in the view model
+    df = get_view_model()['department']
     if df.empty:
         st.warning("数据文件中没有有效的部门数据。")
         return
@@ -887,19 +985,10 @@ def show_department_sales_page():
     payment_col_normal = '本月回未超期款'
     payment_col_overdue = '本月回超期款'
 
-    if payment_col_normal in df.columns and payment_col_overdue in df.columns:
-        df['月总回款额'] = df[payment_col_normal].fillna(0) + df[payment_col_overdue].fillna(0)
-    else:
+    if '月总回款额' not in df.columns:
         st.error(f"月度回款列缺失，请检查文件中的列名是否为 '{payment_col_normal}' 和 '{payment_col_overdue}'。")
         return
 
-    # Calculate total weekly payments using corrected column names
-    for i in range(1, 6):
-        week_payment_normal = f'第{i}周回未超期款'
-        week_payment_overdue = f'第{i}周回超期款'
-        if week_payment_normal in df.columns and week_payment_overdue in df.columns:
-            df[f'第{i}周总回款额'] = df[week_payment_normal].fillna(0) + df[week_payment_overdue].fillna(0)
-
     # --- 1 & 2. Rankings ---
     st.markdown('<h3 class="section-title fade-in">月度排名</h3>', unsafe_allow_html=True)
     col1, col2 = st.columns(2)
@@ -1028,6 +1117,121 @@ def show_department_sales_page():
         st.markdown("</div>", unsafe_allow_html=True)
 
 
+# 员工姓名到所在行号的索引，同名时取第一行
+def employee_row_index(df):
+    rows = {}
+    for position, name in enumerate(df['员工姓名']):
+        if pd.notna(name):
+            rows.setdefault(name, position)
+    return rows
+
+
+# 员工各周金额长表（万元），按员工、周次顺序排列，只保留大于0的数据
+def weekly_employee_amounts(sales, week_cols, suffix, value_name):
+    values = sales[week_cols].to_numpy(dtype=float) / 10000
+    long_df = pd.DataFrame({
+        '员工姓名': np.repeat(sales['员工姓名'].to_numpy(), len(week_cols)),
+        '周次': np.tile([col.replace(suffix, '') for col in week_cols], len(sales)),
+        value_name: values.ravel()
+    })
+    return long_df[long_df[value_name] > 0].reset_index(drop=True)
+
+
+# 积分数据合并销售回款数据，供员工销售回款详情使用
+def merge_score_sales(score_df, sales_df):
+    if sales_df is None or sales_df.empty:
+        return score_df
+    sales_cols = ['员工姓名', '本月销售额', '本月回款合计', '本月回未超期款', '本月回超期款',
+                  '月末逾期未收回额', '本月销售任务', '销售业绩完成进度',
+                  '本月回款任务', '回款业绩完成进度']
+    week_cols = [col for col in sales_df.columns if '周销售额' in col or '周回款合计' in col]
+    sales_cols.extend(week_cols)
+    ref_cols = [col for col in sales_df.columns if '上月' in col and '参考' in col]
+    sales_cols.extend(ref_cols)
+
+    if '队名' in sales_df.columns:
+        sales_cols.append('队名')
+        existing_sales_cols = [col for col in sales_cols if col in sales_df.columns]
+        return pd.merge(score_df.drop(columns=['队名'], errors='ignore'),
+                        sales_df[existing_sales_cols], on='员工姓名', how='left')
+    existing_sales_cols = [col for col in sales_cols if col in sales_df.columns]
+    return pd.merge(score_df, sales_df[existing_sales_cols], on='员工姓名', how='left')
+
+
+# 各页面共用的视图数据：排除合计行的销售数据、按周和按队汇总的万元金额、员工各周数据长表、
+# 员工明细及按姓名的行号索引、计算了总回款额的部门数据。每个数据集只生成一次，页面只读取不修改
+def build_view_model(score_df, sales_df, department_sales_df):
+    view = {
+        'sales': None,
+        'weekly_totals': {},
+        'team_totals': None,
+        'weekly_employee_sales': None,
+        'weekly_employee_payments': None,
+        'scores': score_df,
+        'score_rows': employee_row_index(score_df),
+        'employees': merge_score_sales(score_df, sales_df),
+        'department': None,
+    }
+    view['employee_rows'] = employee_row_index(view['employees'])
+
+    if sales_df is not None and not sales_df.empty:
+        # 排除合计行
+        sales = sales_df[(sales_df['员工姓名'] != '合计') & sales_df['员工姓名'].notna()]
+        view['sales'] = sales
+
+        # 各周销售额、回款额合计，只转换单位为万元
+        for i in range(1, 6):
+            sales_col = f'第{i}周销售额'
+            payment_col = f'第{i}周回款合计'
+            if sales_col in sales.columns and payment_col in sales.columns:
+                view['weekly_totals'][f'第{i}周'] = {
+                    '销售额(万元)': sales[sales_col].sum() / 10000,
+                    '回款额(万元)': sales[payment_col].sum() / 10000
+                }
+
+        # 各队销售额、回款额合计
+        if '队名' in sales.columns:
+            team_totals = sales.groupby('队名').agg({
+                '本月销售额': 'sum',
+                '本月回款合计': 'sum',
+                '员工姓名': 'count'
+            }).rename(columns={'员工姓名': '团队人数'}).reset_index()
+            team_totals['本月销售额(万元)'] = team_totals['本月销售额'] / 10000
+            team_totals['本月回款合计(万元)'] = team_totals['本月回款合计'] / 10000
+            view['team_totals'] = team_totals
+
+        # 员工各周销售额、回款额
+        week_sales_cols = [f'第{i}周销售额' for i in range(1, 6) if f'第{i}周销售额' in sales.columns]
+        week_payment_cols = [f'第{i}周回款合计' for i in range(1, 6) if f'第{i}周回款合计' in sales.columns]
+        if week_sales_cols and week_payment_cols:
+            view['weekly_employee_sales'] = weekly_employee_amounts(sales, week_sales_cols, '销售额', '销售额(万元)')
+            view['weekly_employee_payments'] = weekly_employee_amounts(sales, week_payment_cols, '回款合计',
+                                                                       '回款额(万元)')
+
+    if department_sales_df is not None:
+        # 排除合计行，计算月度和各周的总回款额
+        department = department_sales_df[department_sales_df['部门'] != '合计'].copy()
+        if '本月回未超期款' in department.columns and '本月回超期款' in department.columns:
+            department['月总回款额'] = department['本月回未超期款'].fillna(0) + department['本月回超期款'].fillna(0)
+            for i in range(1, 6):
+                week_payment_normal = f'第{i}周回未超期款'
+                week_payment_overdue = f'第{i}周回超期款'
+                if week_payment_normal in department.columns and week_payment_overdue in department.columns:
+                    department[f'第{i}周总回款额'] = (department[week_payment_normal].fillna(0) +
+                                                   department[week_payment_overdue].fillna(0))
+        view['department'] = department
+
+    return view
+
+
+# 当前数据集的视图数据，首次使用时生成
+def get_view_model():
+    if st.session_state.view_model is None:
+        st.session_state.view_model = build_view_model(st.session_state.score_df, st.session_state.sales_df,
+                                                       st.session_state.department_sales_df)
+    return st.session_state.view_model
+
+
 # 获取小组数据
 def get_group_data(score_df):
     if score_df is None or score_df.empty:
@@ -1449,12 +1653,8 @@ def display_achievement_badges(score_df, sales_df=None):
     </style>
     """, unsafe_allow_html=True)
 
-    # 直接使用销售回款数据统计表
-    df = sales_df.copy()
-
-    # 排除合计行
-    df = df[df['员工姓名'] != '合计']
-    df = df[df['员工姓名'].notna()]
+    # 直接使用已排除合计行的销售回款数据统计表
+    df = sales_df
 
     # 定义成就字典
     achievements = {}
@@ -1480,17 +1680,16 @@ def display_achievement_badges(score_df, sales_df=None):
         if all(col in df.columns for col in
                ['本月销售额', LAST_MONTH_SALES_COL, '本月回款合计', LAST_MONTH_PAYMENT_COL]):
             # 确保所有列都为数值类型
-            for col in ['本月销售额', LAST_MONTH_SALES_COL, '本月回款合计', LAST_MONTH_PAYMENT_COL]:
-                df[col] = pd.to_numeric(df[col], errors='coerce')
-                df[col] = df[col].fillna(0)
+            amounts = {col: pd.to_numeric(df[col], errors='coerce').fillna(0)
+                       for col in ['本月销售额', LAST_MONTH_SALES_COL, '本月回款合计', LAST_MONTH_PAYMENT_COL]}
 
             # 计算进步值
-            df['进步值'] = (df['本月销售额'] - df[LAST_MONTH_SALES_COL]) * 0.6 + (
-                        df['本月回款合计'] - df[LAST_MONTH_PAYMENT_COL]) * 0.4
+            progress = (amounts['本月销售额'] - amounts[LAST_MONTH_SALES_COL]) * 0.6 + (
+                        amounts['本月回款合计'] - amounts[LAST_MONTH_PAYMENT_COL]) * 0.4
 
             # 找出进步值最高的员工
             if not df.empty:
-                max_progress_row = df.loc[df['进步值'].idxmax()]
+                max_progress_row = df.loc[progress.idxmax()]
                 if pd.notna(max_progress_row['员工姓名']):
                     achievements['进步最快'] = {'icon': '🚀', 'recipient': max_progress_row['员工姓名']}
 
@@ -1550,39 +1749,22 @@ def display_achievement_badges(score_df, sales_df=None):
 
 
 # 显示员工详情
-def display_employee_details(score_df, sales_df=None):
-    if score_df is None or score_df.shape[0] == 0:
+# employee_rows 为视图数据中员工姓名到行号的索引
+def display_employee_details(df, employee_rows):
+    if df is None or df.shape[0] == 0:
         return
     st.markdown('<h3 class="section-title fade-in">📋 员工积分详情</h3>', unsafe_allow_html=True)
-    if '员工姓名' not in score_df.columns or len(score_df['员工姓名']) == 0:
+    if '员工姓名' not in df.columns or len(df['员工姓名']) == 0:
         st.info("没有员工数据")
         return
-
-    df = score_df.copy()
-    if sales_df is not None and not sales_df.empty:
-        sales_cols = ['员工姓名', '本月销售额', '本月回款合计', '本月回未超期款', '本月回超期款',
-                      '月末逾期未收回额']
-        week_cols = [col for col in sales_df.columns if '周周' in col or '周销售额' in col or '周回款合计' in col]
-        sales_cols.extend(week_cols)
-        ref_cols = [col for col in sales_df.columns if '上月' in col and '参考' in col]
-        sales_cols.extend(ref_cols)
-
-        if '队名' in sales_df.columns:
-            sales_cols.append('队名')
-            existing_sales_cols = [col for col in sales_cols if col in sales_df.columns]
-            df = pd.merge(df.drop(columns=['队名'], errors='ignore'),
-                          sales_df[existing_sales_cols], on='员工姓名', how='left')
-        else:
-            existing_sales_cols = [col for col in sales_cols if col in sales_df.columns]
-            df = pd.merge(df, sales_df[existing_sales_cols], on='员工姓名', how='left')
+    has_sales = '本月销售额' in df.columns  # 是否已合并销售回款数据
 
     selected_employee = st.selectbox("选择员工查看积分详情", df['员工姓名'].unique())
     if selected_employee:
-        emp_row = df[df['员工姓名'] == selected_employee]
-        if len(emp_row) == 0:
+        if selected_employee not in employee_rows:
             st.warning("未找到该员工数据")
             return
-        emp_data = emp_row.iloc[0]
+        emp_data = df.iloc[employee_rows[selected_employee]]
 
         categories = ['销售额目标分', '回款额目标分', '超期账款追回分',
                       '销售排名分', '回款排名分',
@@ -1665,7 +1847,7 @@ def display_employee_details(score_df, sales_df=None):
                         </div>
                         """, unsafe_allow_html=True)
 
-            if sales_df is not None and '本月销售额' in emp_data:
+            if has_sales and '本月销售额' in emp_data:
                 st.markdown("""
                 <div style="margin-top:20px; padding-top:20px; border-top:0.5px solid rgba(0, 0, 0, 0.05);">
                     <div style="font-weight:600; margin-bottom:15px; color:#86868B; font-family: 'SF Pro Text';">月度销售数据:</div>
@@ -1710,7 +1892,7 @@ def display_employee_details(score_df, sales_df=None):
                             """, unsafe_allow_html=True)
 
                 week_data = []
-                if sales_df is not None:
+                if has_sales:
                     for i in range(1, 6):
                         week_sales_col = f'第{i}周销售额'
                         week_payment_col = f'第{i}周回款合计'
@@ -1909,16 +2091,13 @@ def display_employee_details(score_df, sales_df=None):
 
 
 # 显示销售概览
-def display_sales_overview(sales_df):
-    if sales_df is None or sales_df.empty:
+def display_sales_overview(view):
+    filtered_df = view['sales']  # 已排除合计行
+    if filtered_df is None or filtered_df.empty:
         return
 
     st.markdown('<h3 class="section-title fade-in">📊 销售回款概览</h3>', unsafe_allow_html=True)
 
-    # 排除合计行
-    filtered_df = sales_df[sales_df['员工姓名'] != '合计'].copy()
-    filtered_df = filtered_df[filtered_df['员工姓名'].notna()]
-
     # 直接使用Excel中的数据，不重新计算
     # 将金额从元转换为万元用于显示
     total_sales = filtered_df['本月销售额'].sum() / 10000
@@ -1983,14 +2162,14 @@ def display_sales_overview(sales_df):
         if '销售业绩完成进度' in filtered_df.columns:
             with progress_cols[0]:
                 # 分类
-                filtered_df['销售完成率分类'] = pd.cut(
+                sales_progress_category = pd.cut(
                     filtered_df['销售业绩完成进度'],
                     bins=[0, 0.66, 1.0, float('inf')],
                     labels=['低于66%', '66%-100%', '超过100%']
                 )
 
                 # 计算分类统计
-                sales_progress_counts = filtered_df['销售完成率分类'].value_counts().reset_index()
+                sales_progress_counts = sales_progress_category.value_counts().reset_index()
                 sales_progress_counts.columns = ['完成率区间', '人数']
 
                 # 饼图
@@ -2011,14 +2190,14 @@ def display_sales_overview(sales_df):
         if '回款业绩完成进度' in filtered_df.columns:
             with progress_cols[1]:
                 # 分类
-                filtered_df['回款完成率分类'] = pd.cut(
+                payment_progress_category = pd.cut(
                     filtered_df['回款业绩完成进度'],
                     bins=[0, 0.66, 1.0, float('inf')],
                     labels=['低于66%', '66%-100%', '超过100%']
                 )
 
                 # 计算分类统计
-                payment_progress_counts = filtered_df['回款完成率分类'].value_counts().reset_index()
+                payment_progress_counts = payment_progress_category.value_counts().reset_index()
                 payment_progress_counts.columns = ['完成率区间', '人数']
 
                 # 饼图
@@ -2036,16 +2215,9 @@ def display_sales_overview(sales_df):
                 st.plotly_chart(fig, use_container_width=True)
 
     # 团队销售与回款对比 - 使用Excel中的预计算数据
-    if '队名' in filtered_df.columns:
+    if view['team_totals'] is not None:
         st.markdown("#### 团队业绩对比")
-        team_sales = filtered_df.groupby('队名').agg({
-            '本月销售额': 'sum',
-            '本月回款合计': 'sum',
-            '员工姓名': 'count'
-        }).rename(columns={'员工姓名': '团队人数'}).reset_index()
-
-        team_sales['本月销售额(万元)'] = team_sales['本月销售额'] / 10000
-        team_sales['本月回款合计(万元)'] = team_sales['本月回款合计'] / 10000
+        team_sales = view['team_totals']
 
         # 显示销售与回款对比图表
         fig = px.bar(team_sales, x='队名', y=['本月销售额(万元)', '本月回款合计(万元)'],
@@ -2075,89 +2247,71 @@ def display_sales_overview(sales_df):
 
 
 # 显示周分析
-def display_weekly_analysis(sales_df):
-    if sales_df is None or sales_df.empty:
+def display_weekly_analysis(view):
+    if view['sales'] is None or view['sales'].empty:
         return
 
     st.markdown('<h3 class="section-title fade-in">📅 周数据分析</h3>', unsafe_allow_html=True)
 
-    # 排除合计行
-    filtered_df = sales_df[sales_df['员工姓名'] != '合计'].copy()
-    filtered_df = filtered_df[filtered_df['员工姓名'].notna()]
-
-    # 直接从Excel中获取的周数据列名
-    week_sales_cols = [f'第{i}周销售额' for i in range(1, 6) if f'第{i}周销售额' in filtered_df.columns]
-    week_payment_cols = [f'第{i}周回款合计' for i in range(1, 6) if f'第{i}周回款合计' in filtered_df.columns]
-
-    if week_sales_cols and week_payment_cols:
-        # 只转换单位为万元用于显示，不做其他计算
-        weekly_totals = {}
-        for i in range(1, 6):
-            sales_col = f'第{i}周销售额'
-            payment_col = f'第{i}周回款合计'
-            if sales_col in filtered_df.columns and payment_col in filtered_df.columns:
-                # 使用Excel中原始数据，只转换单位
-                weekly_totals[f'第{i}周'] = {
-                    '销售额(万元)': filtered_df[sales_col].sum() / 10000,
-                    '回款额(万元)': filtered_df[payment_col].sum() / 10000
-                }
-        if weekly_totals:
-            weeks = list(weekly_totals.keys())
-            sales_values = [weekly_totals[week]['销售额(万元)'] for week in weeks]
-            payment_values = [weekly_totals[week]['回款额(万元)'] for week in weeks]
-            fig = go.Figure()
-            fig.add_trace(go.Scatter(
-                x=weeks, y=sales_values, mode='lines+markers',
-                name='周销售额', line=dict(color='#0A84FF', width=3.5),
-                marker=dict(size=10, color='#0A84FF')
-            ))
-            fig.add_trace(go.Scatter(
-                x=weeks, y=payment_values, mode='lines+markers',
-                name='周回款额', line=dict(color='#BF5AF2', width=3.5),
-                marker=dict(size=10, color='#BF5AF2')
-            ))
-            fig.update_layout(
-                title='各周销售与回款趋势（单位：万元）',
-                xaxis_title='周次',
-                yaxis_title='金额（万元）',
-                height=450,
-                paper_bgcolor='rgba(0,0,0,0)',
-                plot_bgcolor='rgba(0,0,0,0)',
-                font=dict(color='#1D1D1F'),
-                legend=dict(
-                    orientation="h",
-                    yanchor="bottom",
-                    y=1.02,
-                    xanchor="right",
-                    x=1
-                )
+    # 视图数据中各周的销售额、回款额合计（万元）
+    weekly_totals = view['weekly_totals']
+    if weekly_totals:
+        weeks = list(weekly_totals.keys())
+        sales_values = [weekly_totals[week]['销售额(万元)'] for week in weeks]
+        payment_values = [weekly_totals[week]['回款额(万元)'] for week in weeks]
+        fig = go.Figure()
+        fig.add_trace(go.Scatter(
+            x=weeks, y=sales_values, mode='lines+markers',
+            name='周销售额', line=dict(color='#0A84FF', width=3.5),
+            marker=dict(size=10, color='#0A84FF')
+        ))
+        fig.add_trace(go.Scatter(
+            x=weeks, y=payment_values, mode='lines+markers',
+            name='周回款额', line=dict(color='#BF5AF2', width=3.5),
+            marker=dict(size=10, color='#BF5AF2')
+        ))
+        fig.update_layout(
+            title='各周销售与回款趋势（单位：万元）',
+            xaxis_title='周次',
+            yaxis_title='金额（万元）',
+            height=450,
+            paper_bgcolor='rgba(0,0,0,0)',
+            plot_bgcolor='rgba(0,0,0,0)',
+            font=dict(color='#1D1D1F'),
+            legend=dict(
+                orientation="h",
+                yanchor="bottom",
+                y=1.02,
+                xanchor="right",
+                x=1
             )
-            fig.update_xaxes(gridcolor='rgba(0,0,0,0.05)')
-            fig.update_yaxes(gridcolor='rgba(0,0,0,0.05)')
-            st.plotly_chart(fig, use_container_width=True)
-            col1, col2 = st.columns(2)
-            with col1:
-                st.markdown("**各周销售额汇总**")
-                week_sales_data = []
-                for week, data in weekly_totals.items():
-                    formatted_sales = format_amount(data['销售额(万元)'])
-                    week_sales_data.append({
-                        '周次': week,
-                        '销售额': formatted_sales
-                    })
-                week_sales_df = pd.DataFrame(week_sales_data)
-                st.dataframe(week_sales_df, use_container_width=True, hide_index=True)
-            with col2:
-                st.markdown("**各周回款额汇总**")
-                week_payment_data = []
-                for week, data in weekly_totals.items():
-                    formatted_payment = format_amount(data['回款额(万元)'])
-                    week_payment_data.append({
-                        '周次': week,
-                        '回款额': formatted_payment
-                    })
-                week_payment_df = pd.DataFrame(week_payment_data)
-                st.dataframe(week_payment_df, use_container_width=True, hide_index=True)
+        )
+        fig.update_xaxes(gridcolor='rgba(0,0,0,0.05)')
+        fig.update_yaxes(gridcolor='rgba(0,0,0,0.05)')
+        st.plotly_chart(fig, use_container_width=True)
+        col1, col2 = st.columns(2)
+        with col1:
+            st.markdown("**各周销售额汇总**")
+            week_sales_data = []
+            for week, data in weekly_totals.items():
+                formatted_sales = format_amount(data['销售额(万元)'])
+                week_sales_data.append({
+                    '周次': week,
+                    '销售额': formatted_sales
+                })
+            week_sales_df = pd.DataFrame(week_sales_data)
+            st.dataframe(week_sales_df, use_container_width=True, hide_index=True)
+        with col2:
+            st.markdown("**各周回款额汇总**")
+            week_payment_data = []
+            for week, data in weekly_totals.items():
+                formatted_payment = format_amount(data['回款额(万元)'])
+                week_payment_data.append({
+                    '周次': week,
+                    '回款额': formatted_payment
+                })
+            week_payment_df = pd.DataFrame(week_payment_data)
+            st.dataframe(week_payment_df, use_container_width=True, hide_index=True)
     else:
         st.info("当前数据中没有周数据信息")
 
@@ -2217,7 +2371,7 @@ def show_ranking_page():
 
         # 添加各周员工销售和回款数据分析
         if st.session_state.sales_df is not None:
-            display_weekly_employee_data(st.session_state.sales_df)
+            display_weekly_employee_data(get_view_model())
 
         if overdue_types:
             st.markdown('<h2 class="section-title fade-in">⚠️ 逾期账款警示榜</h2>', unsafe_allow_html=True)
@@ -2376,40 +2530,22 @@ def display_rank_data(tab, rank_type, ranking_df):
 
 
 # 销售回款相关的员工详情
-def display_sales_employee_details(score_df, sales_df=None):
-    if score_df is None or score_df.shape[0] == 0:
+# df 为视图数据中积分与销售回款合并后的员工明细，employee_rows 为员工姓名到行号的索引
+def display_sales_employee_details(df, employee_rows):
+    if df is None or df.shape[0] == 0:
         return
     st.markdown('<h3 class="section-title fade-in">💰 员工销售回款详情</h3>', unsafe_allow_html=True)
-    if '员工姓名' not in score_df.columns or len(score_df['员工姓名']) == 0:
+    if '员工姓名' not in df.columns or len(df['员工姓名']) == 0:
         st.info("没有员工数据")
         return
-
-    df = score_df.copy()
-    if sales_df is not None and not sales_df.empty:
-        sales_cols = ['员工姓名', '本月销售额', '本月回款合计', '本月回未超期款', '本月回超期款',
-                      '月末逾期未收回额', '本月销售任务', '销售业绩完成进度',
-                      '本月回款任务', '回款业绩完成进度']
-        week_cols = [col for col in sales_df.columns if '周销售额' in col or '周回款合计' in col]
-        sales_cols.extend(week_cols)
-        ref_cols = [col for col in sales_df.columns if '上月' in col and '参考' in col]
-        sales_cols.extend(ref_cols)
-
-        if '队名' in sales_df.columns:
-            sales_cols.append('队名')
-            existing_sales_cols = [col for col in sales_cols if col in sales_df.columns]
-            df = pd.merge(df.drop(columns=['队名'], errors='ignore'),
-                          sales_df[existing_sales_cols], on='员工姓名', how='left')
-        else:
-            existing_sales_cols = [col for col in sales_cols if col in sales_df.columns]
-            df = pd.merge(df, sales_df[existing_sales_cols], on='员工姓名', how='left')
+    has_sales = '本月销售额' in df.columns  # 是否已合并销售回款数据
 
     selected_employee = st.selectbox("选择员工查看销售回款数据", df['员工姓名'].unique())
     if selected_employee:
-        emp_row = df[df['员工姓名'] == selected_employee]
-        if len(emp_row) == 0:
+        if selected_employee not in employee_rows:
             st.warning("未找到该员工数据")
             return
-        emp_data = emp_row.iloc[0]
+        emp_data = df.iloc[employee_rows[selected_employee]]
 
         # 更新要显示的分类
         sales_categories = []
@@ -2547,7 +2683,7 @@ def display_sales_employee_details(score_df, sales_df=None):
                             """, unsafe_allow_html=True)
 
                 week_data = []
-                if sales_df is not None:
+                if has_sales:
                     for i in range(1, 6):
                         week_sales_col = f'第{i}周销售额'
                         week_payment_col = f'第{i}周回款合计'
@@ -2745,21 +2881,14 @@ def display_sales_employee_details(score_df, sales_df=None):
 
 
 # 显示各周员工销售和回款数据 - 直接使用Excel中的数据
-def display_weekly_employee_data(sales_df):
-    if sales_df is None or sales_df.empty:
+def display_weekly_employee_data(view):
+    if view['sales'] is None or view['sales'].empty:
         return
 
     st.markdown('<h2 class="section-title fade-in">📊 各周员工数据分析</h2>', unsafe_allow_html=True)
 
-    # 排除合计行
-    filtered_df = sales_df[sales_df['员工姓名'] != '合计'].copy()
-    filtered_df = filtered_df[filtered_df['员工姓名'].notna()]
-
-    # 从Excel数据中获取周销售额和周回款额的列名
-    week_sales_cols = [f'第{i}周销售额' for i in range(1, 6) if f'第{i}周销售额' in filtered_df.columns]
-    week_payment_cols = [f'第{i}周回款合计' for i in range(1, 6) if f'第{i}周回款合计' in filtered_df.columns]
-
-    if not week_sales_cols or not week_payment_cols:
+    # 视图数据中员工各周的销售额、回款额（万元）
+    if view['weekly_employee_sales'] is None:
         st.info("当前数据中没有周数据信息")
         return
 
@@ -2774,26 +2903,10 @@ def display_weekly_employee_data(sales_df):
         </div>
         """, unsafe_allow_html=True)
 
-        # 准备数据 - 直接使用Excel数据，只转换单位
-        weeks = [col.replace('销售额', '') for col in week_sales_cols]
-        employee_sales_data = []
-
-        for _, row in filtered_df.iterrows():
-            employee_name = row['员工姓名']
-            for week_col in week_sales_cols:
-                week = week_col.replace('销售额', '')
-                # 只转换单位为万元，不做额外计算
-                sales_value = row[week_col] / 10000
-                if sales_value > 0:  # 只显示有销售额的数据
-                    employee_sales_data.append({
-                        '员工姓名': employee_name,
-                        '周次': week,
-                        '销售额(万元)': sales_value
-                    })
+        # 只显示有销售额的数据
+        employee_sales_df = view['weekly_employee_sales']
 
-        if employee_sales_data:
-            # 创建DataFrame
-            employee_sales_df = pd.DataFrame(employee_sales_data)
+        if not employee_sales_df.empty:
 
             # 绘制折线图
             fig = px.line(
@@ -2837,25 +2950,10 @@ def display_weekly_employee_data(sales_df):
         </div>
         """, unsafe_allow_html=True)
 
-        # 准备数据 - 直接使用Excel数据，只转换单位
-        employee_payment_data = []
-
-        for _, row in filtered_df.iterrows():
-            employee_name = row['员工姓名']
-            for week_col in week_payment_cols:
-                week = week_col.replace('回款合计', '')
-                # 只转换单位为万元，不做额外计算
-                payment_value = row[week_col] / 10000
-                if payment_value > 0:  # 只显示有回款额的数据
-                    employee_payment_data.append({
-                        '员工姓名': employee_name,
-                        '周次': week,
-                        '回款额(万元)': payment_value
-                    })
+        # 只显示有回款额的数据
+        employee_payment_df = view['weekly_employee_payments']
 
-        if employee_payment_data:
-            # 创建DataFrame
-            employee_payment_df = pd.DataFrame(employee_payment_data)
+        if not employee_payment_df.empty:
 
             # 绘制折线图
             fig = px.line(
@@ -2933,7 +3031,8 @@ def show_history_compare_page():
                 continue
 
             # 加载Excel数据
-            score_df, sales_df, department_sales_df, ranking_df, error = load_excel_data(uploaded_file)
+            score_df, sales_df, department_sales_df, ranking_df, missing_sheets, error = \
+                load_excel_data_cached(uploaded_file)
 
             if error:
                 st.error(f"文件 {uploaded_file.name} 加载失败: {error}")
@@ -3693,12 +3792,14 @@ def main():
     if not st.session_state.data_loaded and st.session_state.file_name is None:
         detected_file = auto_detect_excel_file()
         if detected_file:
-            score_df, sales_df, department_sales_df, ranking_df, error = load_excel_data(detected_file)
+            score_df, sales_df, department_sales_df, ranking_df, missing_sheets, error = \
+                load_excel_data_cached(detected_file)
             if not error:
                 st.session_state.score_df = score_df
                 st.session_state.sales_df = sales_df
                 st.session_state.department_sales_df = department_sales_df
                 st.session_state.ranking_df = ranking_df
+                st.session_state.view_model = None
                 st.session_state.data_loaded = True
                 st.session_state.file_name = detected_file
             else: